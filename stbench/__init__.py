@@ -1,9 +1,12 @@
 from typing import Iterable
 
+import atexit
 import csv
 import logging
 
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
+from queue import SimpleQueue
 
 from .tools import Query, semgrep
 
@@ -16,6 +19,20 @@ def report(*lines: str):
     return reporter.info('\n' + '\n- '.join(lines))
 
 
+def background(handler: logging.Handler) -> logging.Handler:
+    '''Forward records to a handler running on a separate thread.'''
+    listener = QueueListener(queue := SimpleQueue[logging.LogRecord](), handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)  # flush pending records
+
+    # drop records before they are formatted and queued
+    queued = QueueHandler(queue)
+    queued.setLevel(handler.level)
+    for filter in handler.filters:
+        queued.addFilter(filter)
+    return queued
+
+
 class Results:
     def __init__(self, path: Path):
         path.mkdir(parents=True, exist_ok=True)
@@ -25,22 +42,23 @@ class Results:
         return self.path / name
 
     def save(self, name: str, it: Iterable[Iterable]):
-        with self.new(name).with_suffix('.csv').open('w') as file:
+        # large buffer to batch the many small per-row writes
+        with self.new(name).with_suffix('.csv').open('w', buffering=1 << 20, newline='', encoding='utf-8') as file:
             logger.info(f'saving: {file.name}')
             csv.writer(file).writerows(it)
 
     def load(self, name: str) -> Iterable[list[str]]:
         if (path := self.new(name).with_suffix('.csv')).exists():
-            with path.open() as file:
+            with path.open(newline='', encoding='utf-8') as file:
                 logger.info(f'loading: {file.name}')
                 yield from csv.reader(file)
 
     def tracer(self, name: str) -> logging.Handler:
         tracer = logging.FileHandler(self.new(name).with_suffix('.log'), 'w')
         tracer.addFilter(logging.Filter(logger.name))
-        return tracer
+        return background(tracer)
 
     def report(self, name: str):
         results = logging.FileHandler(self.new(name).with_suffix('.log'), 'w')
         results.setFormatter(logging.Formatter('%(message)s'))
-        reporter.addHandler(results)
+        reporter.addHandler(background(results))
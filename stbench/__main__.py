@@ -1,10 +1,12 @@
 #!/usr/bin/env python3
 
-from typing import Iterable
+from typing import Iterable, Any
 
 import logging
 
 from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from functools import cache
 from itertools import accumulate, product, groupby
 from pathlib import Path
 
@@ -26,6 +28,8 @@ class Args:
     corpus: Path
     results: Path
     fresh: bool
+    verbose: bool
+    jobs: int
 
 
 def add_args(parser: ArgumentParser):
@@ -33,6 +37,9 @@ def add_args(parser: ArgumentParser):
     parser.add_argument('--corpus', required=True, type=Path)
     parser.add_argument('--results', required=True, type=Path)
     parser.add_argument('--fresh', action='store_true')
+    parser.add_argument('--verbose', action='store_true')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='concurrent stsearch runs (>1 affects the reported timings)')
 
 
 def main(args: Args):
@@ -58,7 +65,7 @@ def main(args: Args):
     results.save('complete', queries)
 
     partial = {q: list(prefixes(q)) for q in queries}
-    upartials = set().union(*partial.values()).difference(queries)
+    upartials = {p for ps in partial.values() for p in ps if p not in queries}
     results.save('partials', ((ps[0].language, *(p.syntax for p in reversed(ps)))
                               for ps in partial.values()))
     results.save('upartials', sorted(upartials))
@@ -97,23 +104,32 @@ def main(args: Args):
     mode = 'w' if args.fresh else 'a'  # keep previous results
     strunner = stsearch.Runner((args.results / 'metrics.csv').open(mode+'+'))
     smrunner = semgrep.Runner((args.results / 'config.yaml'),
-                              (args.results / 'semgrep.err').open(mode))
+                              (args.results / 'semgrep.err').open(mode), args.verbose)
 
     for project, files in projects.items():
-        logger.info(f' > project: {project}')
+        logger.info(' > project: %s', project)
         fmodels = File.from_proj(files)
 
-        logger.info(f'  * complete - {st.name}')
-        Run.batch(st, complete, fmodels, strunner)
+        logger.info('  * complete - %s', st.name)
+        Run.batch(st, complete, fmodels, strunner, args.jobs)
 
-        logger.info(f'  * complete - {sg.name}')
+        logger.info('  * complete - %s', sg.name)
         Run.batchX(sg, complete, project, fmodels, smrunner)
 
-        logger.info(f'  * partials - {st.name}')
-        Run.batch(st, upartials, fmodels, strunner)
+        logger.info('  * partials - %s', st.name)
+        Run.batch(st, upartials, fmodels, strunner, args.jobs)
 
     epaths = sorted(smrunner.epaths)
-    metrics = list(strunner.metrics())
+
+    # index the recorded metrics in a single pass
+    seqs: dict[Query, Any] = {}  # i.e. Metrics.Seq, Tree and Time
+    trees: dict[str, Any] = {}
+    runs: dict[tuple[Query, str], Any] = {}
+    for m in strunner.metrics():
+        if m.query in queries:
+            seqs[m.query] = m.seq
+        trees[m.path] = m.tree
+        runs[m.query, m.path] = m.time
 
     if not args.fresh:
         epaths += [p for p, in results.load('errpaths')]
@@ -121,13 +137,13 @@ def main(args: Args):
 
     report(f'# BENCHMARK')
 
-    seqs = {m.query: m.seq for m in metrics if m.query in queries}
     report(stats('token length', (s.length for s in seqs.values()), 'tokens'))
     report(stats('wildcards', (s.wcount for s in seqs.values()), 'wildcards'))
 
     files = (f for fs in projects.values() for f in fs)
-    report(stats('file size', (f.stat().st_size for f in files), 'B'))
-    trees = {m.path: m.tree for m in metrics}
+    with ThreadPoolExecutor(32) as pool:  # overlap stat latency (e.g. network mounts)
+        sizes = list(pool.map(lambda f: f.stat().st_size, files))
+    report(stats('file size', sizes, 'B'))
     report(stats('tree size', (t.size for t in trees.values()), 'nodes'))
     report(stats('tree depth', (t.depth for t in trees.values()), 'nodes'))
 
@@ -148,7 +164,7 @@ def main(args: Args):
 
     totals = {q: t for q, t in select.qtotals(st)}
     partial = {q: ps for q, ps in partial.items() if totals[q]}
-    upartials = set().union(*partial.values()).difference(queries)
+    upartials = {p for ps in partial.values() for p in ps if p not in queries}
     report(
         f'analysis prelude',
         f'selected {len(partial)} queries w/ results',
@@ -160,12 +176,19 @@ def main(args: Args):
 
     report(f'# PERFORMANCE')
 
-    runs = {(m.query, m.path): m.time for m in metrics}
     report(stats('parse time', (t.parse for t in runs.values()), 'µs'))
     report(stats('search time', (t.search for t in runs.values()), 'µs'))
 
-    pruns = {(q, p): sum(runs[q, str(f)].search for f in fs if (q, str(f)) in runs)
-             for q, (p, fs) in product(queries, projects.items())}
+    # single pass over runs, instead of probing every (query, file) pair
+    fprojs: dict[str, list[Path]] = {}  # projects may overlap
+    for p, fs in projects.items():
+        for f in fs:
+            fprojs.setdefault(str(f), []).append(p)
+    pruns = dict.fromkeys(product(queries, projects), 0)
+    for (q, path), t in runs.items():
+        for p in fprojs.get(path, ()):
+            if (key := (q, p)) in pruns:
+                pruns[key] += t.search
     report(stats('project search', pruns.values(), 'µs'))
 
     no_excl = sum(1 for i, b, e in matches.values() if not e)
@@ -182,7 +205,7 @@ def main(args: Args):
 
 def prefixes(query: Query) -> Iterable[Query]:
     '''Generate all (unambiguous) token prefixes for a given query.'''
-    lexer = get_lexer_by_name(query.language.name)
+    lexer = lexer_for(query.language.name)
 
     prefixes = accumulate(v for t, v in lex(query.syntax, lexer))
     queries = map(lambda p: query._replace(syntax=p), prefixes)
@@ -190,6 +213,12 @@ def prefixes(query: Query) -> Iterable[Query]:
     return (next(qs) for q, qs in groupby(queries, key=Query.strip))
 
 
+@cache
+def lexer_for(name: str):
+    '''Build each language's lexer (and its compiled regexes) only once.'''
+    return get_lexer_by_name(name)
+
+
 if __name__ == '__main__':
     parser = ArgumentParser()
     add_args(parser)
@@ -2,7 +2,7 @@ from typing import Self, Iterable, Any
 
 from pathlib import Path
 
-from peewee import SqliteDatabase, Model, IntegrityError, chunked
+from peewee import SqliteDatabase, Model, IntegrityError
 
 
 db = SqliteDatabase(None)
@@ -16,13 +16,19 @@ class Base(Model):
         database = db
 
     @classmethod
-    def bulk_insert(cls, it: Iterable[tuple], fields=None):
+    def bulk_insert(cls, it: Iterable[tuple], fields=None, ignore=False):
+        '''Insert rows of raw column values (i.e. ids for foreign keys).'''
         if fields is None:
             fields = cls._meta.sorted_field_names[1:]  # type: ignore
 
-        # https://www.sqlite.org/limits.html#max_variable_number
-        for chunk in chunked(it, 32766 // len(fields)):
-            cls.insert_many(chunk, fields).execute()
+        table = cls._meta.table_name  # type: ignore
+        columns = [cls._meta.fields[f].column_name for f in fields]  # type: ignore
+        verb = 'INSERT OR IGNORE' if ignore else 'INSERT'  # i.e. skip unique violations
+        sql = f'{verb} INTO "{table}" ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})'
+
+        # one prepared statement for all rows, skipping peewee's query building
+        with db.atomic():
+            db.cursor().executemany(sql, it)
 
     _created: bool
 
@@ -45,6 +51,9 @@ def prepare(database: Path, truncate=False):
         'foreign_keys': 1,
         'ignore_check_constraints': 0,
         'synchronous': 0,
+        # keep reporting aggregations (group by/sort) off disk
+        'temp_store': 'memory',
+        'mmap_size': 1 << 28,  # 256MB
     })
 
     models = [m for m in Base.__subclasses__()]
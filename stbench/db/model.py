@@ -1,14 +1,16 @@
-from typing import Self, Iterable, TypeAlias, Callable, Any
+from typing import Self, Optional, Iterable, TypeAlias, Callable, Any
 
 import logging
 
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
 from itertools import product
 from pathlib import Path
 
-from peewee import ForeignKeyField, CharField, IntegerField
+from peewee import ForeignKeyField, CharField, IntegerField, chunked, fn
 from playhouse.sqlite_ext import JSONField
 
-from ..tools import Language, Query, Match
+from ..tools import Query, Match
 from . import Base, db
 
 
@@ -19,8 +21,11 @@ class Tool(Base):
     name: str = CharField(unique=True)  # type: ignore
 
     @classmethod
+    @db.atomic()
     def from_names(cls, *names: str) -> list[Self]:
-        return [cls.ensure(name=n) for n in names]
+        cls.bulk_insert(((n,) for n in names), ignore=True)
+        tools = {t.name: t for t in cls.select().where(cls.name.in_(names))}  # type: ignore
+        return [tools[n] for n in names]
 
 
 class Spec(Base):
@@ -41,19 +46,31 @@ class Spec(Base):
         return cls.ensure(data=data)
 
     def query(self, tool: Tool):
-        return Query(Language(self.data['lang']), self.data[tool.name])
+        return Query.of(self.data['lang'], self.data[tool.name])
 
     @classmethod
     def queryc(cls, tool: Tool):
-        return cls.data.extract_json(f'$.{tool.name}')  # type: ignore
+        return cls.data.extract_text(f'$.{tool.name}')  # type: ignore
+
+    @classmethod
+    def langc(cls):
+        return cls.data.extract_text('$.lang')  # type: ignore
 
 
 class File(Base):
     path: str = CharField(unique=True)  # type: ignore
 
     @classmethod
+    @db.atomic()
     def from_proj(cls, project: list[Path]) -> dict[str, Self]:
-        return {str(p): cls.ensure(path=p) for p in project}
+        paths = [str(p) for p in project]
+        cls.bulk_insert(((p,) for p in paths), ignore=True)
+
+        files: dict[str, Self] = {}
+        # https://www.sqlite.org/limits.html#max_variable_number
+        for chunk in chunked(paths, 32766):
+            files.update((f.path, f) for f in cls.select().where(cls.path.in_(chunk)))  # type: ignore
+        return {p: files[p] for p in paths}
 
 
 class Run(Base):
@@ -62,7 +79,10 @@ class Run(Base):
     file: File = ForeignKeyField(File)  # type: ignore
 
     class Meta:  # type: ignore
-        indexes = (('tool', 'spec', 'file'), True),
+        indexes = (
+            (('tool', 'spec', 'file'), True),
+            (('spec', 'tool'), False),  # reporting aggregates per spec
+        )
 
     # Silence report type errors
     tool_id: Any
@@ -70,24 +90,68 @@ class Run(Base):
     file_id: Any
 
     @classmethod
-    def register(cls, tool: Tool, spec: Spec, file: File) -> Self:
-        return cls.ensure(tool=tool, spec=spec, file=file)
+    def register_all(cls, tool: Tool, specs: list[Spec], files: list[File],
+                     pairs: Optional[Iterable[tuple[Spec, File]]] = None) -> dict[tuple[int, int], Self]:
+        '''Ensure runs for all (or only the given) pairs, keyed by (spec id, file id).'''
+        last = cls.select(fn.MAX(cls.id)).scalar() or 0
+        pairs = product(specs, files) if pairs is None else pairs
+        cls.bulk_insert(((tool.id, s.id, f.id) for s, f in pairs), ignore=True)
+
+        runs = cls.lookup(tool, specs, files)
+        for run in runs.values():
+            run._created = run.id > last  # rowids only grow
+        return runs
+
+    @classmethod
+    def lookup(cls, tool: Tool, specs: list[Spec], files: list[File]) -> dict[tuple[int, int], Self]:
+        '''Find the registered runs, keyed by (spec id, file id).'''
+        runs: dict[tuple[int, int], Self] = {}
+        # https://www.sqlite.org/limits.html#max_variable_number
+        for ss, fs in product(chunked(specs, 16383), chunked(files, 16382)):
+            query = cls.select().where((cls.tool == tool) & cls.spec.in_(ss) & cls.file.in_(fs))
+            runs.update(((run.spec_id, run.file_id), run) for run in query)
+        return runs
 
     Runner: TypeAlias = Callable[[Query, str], Iterable[Match]]
 
     @classmethod
-    @db.atomic()
-    def collect(cls, tool: Tool, spec: Spec, file: File, runner: Runner):
-        if (run := cls.register(tool, spec, file))._created:
-            matches = runner(spec.query(tool), file.path)
-            Result.bulk_insert((run, *r) for f, r in matches)
-        else:
-            logger.debug(f'cached - {tool.name} #{spec.id} {file.path}')
+    def collect(cls, tool: Tool, jobs: list[tuple[Spec, File]], matches: Iterable[list[Match]]):
+        '''Register the given runs together with their matches.'''
+        specs = list(dict.fromkeys(s for s, f in jobs))
+        files = list(dict.fromkeys(f for s, f in jobs))
+        runs = cls.register_all(tool, specs, files, jobs)
+
+        Result.bulk_insert((runs[spec.id, file.id].id, *r)
+                           for (spec, file), ms in zip(jobs, matches) for f, r in ms)
 
     @classmethod
-    def batch(cls, tool: Tool, specs: list[Spec], fmodels: dict[str, File], runner: Runner):
-        for spec, file in product(specs, fmodels.values()):
-            cls.collect(tool, spec, file, runner)
+    @db.atomic()
+    def batch(cls, tool: Tool, specs: list[Spec], fmodels: dict[str, File], runner: Runner,
+              jobs: int = 1):
+        def pending() -> Iterable[tuple[Spec, File]]:
+            cached = cls.lookup(tool, specs, list(fmodels.values()))
+            for spec, file in product(specs, fmodels.values()):
+                if (spec.id, file.id) not in cached:
+                    yield spec, file
+                else:
+                    logger.debug('cached - %s #%s %s', tool.name, spec.id, file.path)
+
+        def run(job: tuple[Spec, File]) -> list[Match]:
+            spec, file = job
+            return list(runner(spec.query(tool), file.path))
+
+        def collect(chunk: list[tuple[Spec, File]], futures: list[Future]):
+            cls.collect(tool, chunk, (f.result() for f in futures))
+
+        # runner calls are independent, but the database has a single writer
+        with ThreadPoolExecutor(jobs) as pool:
+            queued: deque[tuple[list, list[Future]]] = deque()
+            for chunk in chunked(pending(), 1024):
+                queued.append((chunk, [pool.submit(run, job) for job in chunk]))
+                if len(queued) > 1:  # keep the next chunk running while collecting
+                    collect(*queued.popleft())
+            while queued:
+                collect(*queued.popleft())
 
     RunnerX: TypeAlias = Callable[[list[Query], Path, list[str]],
                                   Iterable[tuple[Query, Match]]]
@@ -96,19 +160,20 @@ class Run(Base):
     @db.atomic()
     def batchX(cls, tool: Tool, specs: list[Spec], root: Path, fmodels: dict[str, File], runner: RunnerX):
         qmodels = {spec.query(tool): spec for spec in specs}
-        runs = {(q, p): cls.register(tool, s, f) for (q, s), (p, f)
+        registered = cls.register_all(tool, specs, list(fmodels.values()))
+        runs = {(q, p): registered[s.id, f.id] for (q, s), (p, f)
                 in product(qmodels.items(), fmodels.items())}
 
         cached = [run.id for run in runs.values() if not run._created]
         if len(cached) != len(runs):
             if cached:  # clear cached results...
                 Result.delete().where(Result.run_id.in_(cached)).execute()
-                logger.warning(f'dropped - [{len(cached)}] {tool.name} runs')
+                logger.warning('dropped - [%d] %s runs', len(cached), tool.name)
 
             matches = runner(list(qmodels), root, list(fmodels))
-            Result.bulk_insert((runs[q, f], *r) for q, (f, r) in matches)
+            Result.bulk_insert((runs[q, f].id, *r) for q, (f, r) in matches)
         else:
-            logger.debug(f'cached - {tool.name} [{len(specs)}] {root}')
+            logger.debug('cached - %s [%d] %s', tool.name, len(specs), root)
 
     def __str__(self) -> str:
         return f''
@@ -117,6 +182,10 @@ class Run(Base):
 class Result(Base):
     run: Run = ForeignKeyField(Run, on_delete='CASCADE')  # type: ignore
 
+    class Meta:  # type: ignore
+        # covers the match grouping in select.umatches
+        indexes = (('run', 'sr', 'sc', 'er', 'ec'), False),
+
     # Silence report type errors
     run_id: Any
 
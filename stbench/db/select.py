@@ -11,9 +11,12 @@ def qdiff(left: Tool, right: Tool, fpaths: list[str]) -> Iterable[tuple[Query, i
         fn.MAX(Run.tool_id == right.id).alias('right'),
     ).where(Run.file_id.not_in(File.select(File.id).where(File.path << fpaths)))  # type: ignore
 
-    return ((s.query(left), s.left, s.both, s.right, s.query(right)) for s in (
+    # select the query columns directly, skipping JSON decoding of Spec.data
+    return ((Query.of(s.lang, s.lq), s.left, s.both, s.right, Query.of(s.lang, s.rq)) for s in (
         Spec.select(
-            Spec,
+            Spec.langc().alias('lang'),
+            Spec.queryc(left).alias('lq'),
+            Spec.queryc(right).alias('rq'),
             fn.SUM(matches.c.left & matches.c.right).alias('both'),
             fn.SUM(matches.c.left & ~matches.c.right).alias('left'),
             fn.SUM(~matches.c.left & matches.c.right).alias('right'),
@@ -24,17 +27,19 @@ def qdiff(left: Tool, right: Tool, fpaths: list[str]) -> Iterable[tuple[Query, i
             Spec.queryc(right).is_null(False)
         )
         .group_by(Spec.id).order_by(Spec.id)
+        .iterator()  # rows are consumed once, skip peewee's result cache
     ))
 
 
 def qtotals(tool: Tool) -> Iterable[tuple[Query, int]]:
     matches: Select = umatches().where(Run.tool_id == tool.id)  # type: ignore
 
-    return ((s.query(tool), s.count) for s in (
-        Spec.select(Spec, count(matches.c.count))
+    return ((Query.of(s.lang, s.q), s.count) for s in (
+        Spec.select(Spec.langc().alias('lang'), Spec.queryc(tool).alias('q'), count(matches.c.count))
         .left_outer_join(matches, on=(Spec.id == matches.c.spec_id))
         .where(Spec.queryc(tool).is_null(False))
         .group_by(Spec.id).order_by(Spec.id)
+        .iterator()  # rows are consumed once, skip peewee's result cache
     ))
 
 
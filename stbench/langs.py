@@ -1,7 +1,9 @@
 from typing import ClassVar, Iterable
 
+import os
+
 from dataclasses import dataclass
-from pathlib import Path
+from pathlib import Path, PurePath
 
 
 @dataclass(frozen=True)
@@ -43,6 +45,18 @@ class Language:
 def find(path: Path, languages: set[Language]) -> Iterable[Path]:
     assert path.exists(), 'invalid selection path'
     exts = {ext for lang in languages for ext in lang.exts()}
-    for p in path.glob('**/*'):
-        if p.is_file() and p.suffix in exts:
-            yield p
+
+    # scandir reports entry types from the directory listing itself,
+    # so (unlike Path.glob) only symlinks cost an extra stat call
+    pending = [str(path)]
+    while pending:
+        try:
+            entries = os.scandir(pending.pop())
+        except PermissionError:
+            continue  # skipped, as Path.glob does
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(entry.path)
+                elif entry.is_file() and PurePath(entry.name).suffix in exts:
+                    yield Path(entry.path)
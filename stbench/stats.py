@@ -1,6 +1,7 @@
 from typing import Iterable, TypeVar, Collection, Callable
 
-from statistics import mean, median, stdev, quantiles
+from math import fsum, sqrt
+from statistics import fmean, median, quantiles
 
 
 T = TypeVar('T')
@@ -10,14 +11,19 @@ tail_pi = 99
 
 
 def stats(name: str, data: Iterable[float], units: str) -> str:
-    vs = list(data)  # materialize values
+    vs = sorted(data)  # materialize values (re-sorting them is linear)
+
+    # float arithmetic, statistics.mean/stdev compute exact fractions
+    mu = fmean(vs)
+    sd = sqrt(fsum((v - mu) ** 2 for v in vs) / (len(vs) - 1))
+
     return '\n- '.join([
         name,
         f'n =\t{len(vs)}',
         f'med\t{median(vs)} {units}',
-        f'mean\t{mean(vs):.2f}±{stdev(vs):.2f} {units}',
+        f'mean\t{mu:.2f}±{sd:.2f} {units}',
         f'{tail_pi}pi\t{quantiles(vs, n=100)[tail_pi - 1]:.2f} {units}',
-        f'max\t{max(vs)} {units}',
+        f'max\t{vs[-1]} {units}',
     ])
 
 
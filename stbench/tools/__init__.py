@@ -2,15 +2,26 @@ from typing import Self, NamedTuple
 
 import re
 
-from operator import itemgetter
+from functools import cache, lru_cache
 
 from ..langs import Language
 
 
+SPACES = re.compile(r'[^\S\n\r]+')
+BLANKLINES = re.compile(r'\n(\r?)\s*\n\r?')
+
+
 class Query(NamedTuple):
     language: Language
     syntax: str
 
+    @classmethod
+    @cache
+    def of(cls, language: str, syntax: str) -> Self:
+        '''Build a query from stored fields, reusing previous instances.'''
+        return cls(Language(language), syntax)
+
+    @lru_cache(maxsize=1 << 16)  # prefixes are shared across queries
     def strip(self) -> Self:
         language, pattern = self
 
@@ -18,8 +29,11 @@ class Query(NamedTuple):
         assert language.name == 'javascript'
 
         pattern = pattern.strip()
-        pattern = re.sub(r'[^\S\n\r]+', ' ', pattern)  # collapse whitespace
-        pattern = re.sub(r'\n(\r?)\s*\n\r?', r'\n\1', pattern)  # and empty lines
+        # other whitespace than ' ' is never printable
+        if '  ' in pattern or not pattern.isprintable():
+            pattern = SPACES.sub(' ', pattern)  # collapse whitespace
+        if '\n' in pattern:
+            pattern = BLANKLINES.sub(r'\n\1', pattern)  # and empty lines
 
         return self._replace(syntax=pattern)
 
@@ -28,15 +42,13 @@ class Match(NamedTuple):
     path: str
     range: 'Range'
 
-    RE = re.compile(r'(.*):(\d+):(\d+)-(\d+):(\d+)\n')
-
     @classmethod
     def parse(cls, line: str) -> Self:
-        match = cls.RE.fullmatch(line)
-        assert match, 'unexpected line formatting'
-        path, *offsets = itemgetter(*range(1, 6))(match)  # type: ignore
-        sr, sc, er, ec = map(int, offsets)
-        return cls(path, Range(sr, sc, er, ec))
+        assert line.endswith('\n'), 'unexpected line formatting'
+        # i.e. path:sr:sc-er:ec, paths may contain colons
+        path, sr, span, ec = line[:-1].rsplit(':', 3)
+        sc, er = span.split('-')
+        return cls(path, Range(int(sr), int(sc), int(er), int(ec)))
 
     def __str__(self) -> str:
         return f'{self.path}:{self.range}'
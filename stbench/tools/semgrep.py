@@ -1,16 +1,24 @@
-from typing import Optional, Iterable, Sequence, TextIO
+from typing import Optional, Iterable, Sequence, TextIO, IO
 
 import json
 import logging
+import os
 import re
 import subprocess
 
+from functools import lru_cache
+from itertools import count
 from operator import itemgetter
 from pathlib import Path
 from tempfile import NamedTemporaryFile
 
 import yaml
 
+try:  # prefer the libyaml bindings
+    from yaml import CSafeLoader as SafeLoader, CSafeDumper as SafeDumper
+except ImportError:
+    from yaml import SafeLoader, SafeDumper  # type: ignore
+
 from . import Language, Query, Match, Range
 
 
@@ -25,18 +33,27 @@ STRMATCH = re.compile(r'"=~\/([^/]|\\\/)*\/"')
 # See: https://semgrep.dev/docs/writing-rules/pattern-syntax/#deep-expression-operator
 DEEP = re.compile(r'<\.{3}(?P<inner>.*?)\.{3}>')
 
+# Typed or plain metavars, renamed by canonical in a single pass
+# (an unwrapped typed metavar absorbs any name characters that follow)
+METAVARS = re.compile(f'{TYPMETAVAR.pattern}[A-Z0-9_]*|{METAVAR.pattern}')
+
+# Ellipsis rewrites applied by canonical
+REDUNDANT = re.compile(r'\.{3}(?:\s*[,\n]\s*\.{3})+')
+ASSIGNED = re.compile(r'=\s*\.{3}$')
+UNBOUNDED = re.compile(r'^\.{3}\s*(?!\.)|(?<!\.)\s*\.{3}$')
+
 
 def rules(source: Path) -> Iterable[tuple[Path, dict]]:
     if source.is_file() and source.suffix == '.yaml':
-        logger.debug(f'config: {source}')
+        logger.debug('config: %s', source)
         with source.open() as file:
-            config: dict = yaml.safe_load(file)
+            config: dict = yaml.load(file, Loader=SafeLoader)
             for rule in config['rules']:
                 name = rule['id']
                 if (msg := rule.get('message')) and re.search('rule (is|has been) deprecated', msg):
-                    logger.warn(f'{name}: deprecated')
+                    logger.warn('%s: deprecated', name)
                     continue  # skip
-                logger.debug(f'rule: {name}')
+                logger.debug('rule: %s', name)
                 yield source, rule
     elif source.is_dir():
         for entry in source.iterdir():
@@ -97,64 +114,66 @@ def patterns(rule: dict, languages: Optional[set[Language]] = None) -> Iterable[
             raise NotImplementedError('rule not identified')
 
 
+@lru_cache(maxsize=1 << 16)  # patterns repeat across rules
 def canonical(query: Query) -> Query:
     '''Given a Semgrep pattern, normalize spacing/naming & remove ambiguity.'''
     language, pattern = query.strip()
 
-    pattern = TYPMETAVAR.sub(lambda m: m['metavar'], pattern)
+    metavars = count(1)  # i.e. numbered in order of appearance
 
-    def metavar(name=None, kind=''):
-        metavars.append(name)
-        return f'${kind}H{len(metavars)}'
-    metavars = []
-
-    pattern = METAVAR.sub(
-        lambda m: metavar(m['name'], m['kind']), pattern)
+    # Skip rewrites that cannot apply (already canonical patterns are common)
+    if '$' in pattern:
+        pattern = METAVARS.sub(
+            lambda m: f'${m["kind"] or ""}H{next(metavars)}', pattern)
 
     # FIX: generalize to more languages
     assert language.name == 'javascript'
 
-    # Sometimes generated when extracting deep patterns
-    redundant_ellipsis = re.compile(r'\.{3}\s*(,|\n)\s*\.{3}')
-    while True:  # needed to replace overlapping matches
-        (pattern, n) = redundant_ellipsis.subn('...', pattern)
-        if not n:
-            break
+    if '...' in pattern:
+        # Sometimes generated when extracting deep patterns
+        while True:  # chains collapse at once, only longer dot runs can overlap
+            (pattern, n) = REDUNDANT.subn('...', pattern)
+            if not n or '....' not in pattern:
+                break
 
-    # Remove most ambiguous unbounded ellipsis
-    pattern = re.sub(r'=\s*\.{3}$', f'= {metavar()}', pattern).strip()
-    pattern = re.sub(r'^\.{3}\s*(?!\.)|(?<!\.)\s*\.{3}$', '', pattern).strip()
+        # Remove most ambiguous unbounded ellipsis
+        pattern = ASSIGNED.sub(f'= $H{next(metavars)}', pattern).strip()
+        pattern = UNBOUNDED.sub('', pattern).strip()
 
     # Remove trivial deep expr for statement semantics
     if pattern.endswith(';') and pattern.count(';') == 1 and '\n' not in pattern:
         pattern = pattern.removesuffix(';')  # i.e. just match the expression
 
     if query.syntax != pattern:
-        logger.debug(f'canonical: {query.syntax!r} => {pattern!r}')
+        logger.debug('canonical: %r => %r', query.syntax, pattern)
 
     return query._replace(syntax=pattern)
 
 
 class Runner:
-    def __init__(self, config: Optional[Path] = None, stderr: Optional[TextIO] = None) -> None:
+    def __init__(self, config: Optional[Path] = None, stderr: Optional[TextIO] = None, verbose=False) -> None:
         Path('.semgrepignore').touch()  # disable semgrep ignore behavior
         self.config, self.stderr, self.epaths = config, stderr, set[str]()
+        self.verbose = verbose
 
     def __call__(self, queries: list[Query], project: Path, files: Sequence[Path | str]) -> Iterable[tuple[Query, Match]]:
-        return run(queries, project, files, self.epaths, self.config, self.stderr)
+        return run(queries, project, files, self.epaths, self.config, self.stderr, self.verbose)
 
 
 def run(queries: list[Query], project: Path, files: Sequence[Path | str], epaths: Optional[set[str]] = None,
-        config: Optional[Path] = None, stderr: Optional[TextIO] = None) -> Iterable[tuple[Query, Match]]:
+        config: Optional[Path] = None, stderr: Optional[TextIO] = None, verbose=False) -> Iterable[tuple[Query, Match]]:
     rules = [rule(str(i), q) for i, q in enumerate(queries)]
     languages = {q.language for q in queries}
 
-    with config.open('w') if config else NamedTemporaryFile('w', suffix='.yaml') as file:
-        yaml.safe_dump({'rules': rules}, file, sort_keys=False)
+    data = yaml.dump({'rules': rules}, Dumper=SafeDumper, sort_keys=False)
+    with config.open('w') if config else tempconfig(len(data.encode())) as file:
+        file.write(data)
         file.flush()
 
         cmd = ['semgrep', 'scan', project, f'--config={file.name}', *FLAGS]
-        logger.debug(f'$ {subprocess.list2cmdline(cmd)}')
+        if verbose:  # only useful when inspecting stderr
+            cmd.append('--verbose')
+        logger.debug('$ %s', subprocess.list2cmdline(cmd))
 
         try:
             output = subprocess.check_output(cmd, text=True, stderr=stderr)
@@ -165,13 +184,13 @@ def run(queries: list[Query], project: Path, files: Sequence[Path | str], epaths
         data = json.loads(output)
 
         for error in data.pop('errors'):
-            logger.warning(f'error: ' + error['message'])
+            logger.warning('error: %s', error['message'])
             if epaths is not None and (path := error.get('path')):
                 epaths.add(path)
 
         expected = set(map(str, files))
         for path in expected.difference(data.pop('paths')['scanned']):
-            logger.warning(f'skipped: {path}')
+            logger.warning('skipped: %s', path)
             if epaths is not None:
                 epaths.add(path)
 
@@ -184,6 +203,14 @@ def run(queries: list[Query], project: Path, files: Sequence[Path | str], epaths
                 yield (queries[i], Match(path, Range(sr, sc, er, ec)))
 
 
+def tempconfig(size: int) -> IO[str]:
+    '''Create a temporary config file, in memory (tmpfs) when it fits.'''
+    shm = '/dev/shm'  # often missing, read-only or small in containers
+    if os.access(shm, os.W_OK | os.X_OK) and (fs := os.statvfs(shm)).f_bavail * fs.f_frsize > size:
+        return NamedTemporaryFile('w', suffix='.yaml', dir=shm)
+    return NamedTemporaryFile('w', suffix='.yaml')
+
+
 def rule(id: str, query: Query) -> dict:
     includes = [f'*{ext}' for ext in query.language.exts()]
     return {
@@ -225,7 +252,6 @@ FLAGS = [
     '--disable-nosem',
     '--max-target-bytes=0',
     '--timeout=0',
-    '--verbose',
     # For performance
     '--metrics=off',
     '--disable-version-check',
@@ -7,14 +7,20 @@ import subprocess
 
 from pathlib import Path
 from io import StringIO
+from threading import Lock
 
-from . import Language, Query, Match
+from . import Query, Match
 from .semgrep import METAVAR
 
 
 logger = logging.getLogger(__name__)
 
 
+# Ellipsis rewrites applied by from_semgrep
+SEPARATED = re.compile(r',?(\s*\.{3}\s*),?')
+DOTTED = re.compile(r'(?<!\.)\.\s*(\.{3}\s*\.)(?!\.)')
+
+
 def from_semgrep(query: Query) -> Query:
     '''Translate a Semgrep query to stsearch.'''
     language, pattern = query
@@ -22,33 +28,47 @@ def from_semgrep(query: Query) -> Query:
     # stsearch doesn't use metavar names or support named ellipsis
     # https://semgrep.dev/docs/writing-rules/pattern-syntax/#ellipsis-metavariables
 
-    def wildcard(kind: str): return '...' if kind == '...' else '$_'
-    pattern = METAVAR.sub(lambda m: wildcard(m['kind']), pattern)
+    if '$' in pattern:  # skip rewrites that cannot apply
+        pattern = METAVAR.sub(wildcard, pattern)
 
     # FIX: generalize to more languages
     assert language.name == 'javascript'
 
-    pattern = re.sub(r',?(\s*\.{3}\s*),?', r'\1', pattern)
-    pattern = re.sub(r'(?<!\.)\.\s*(\.{3}\s*\.)(?!\.)', r'\1', pattern)
+    if '...' in pattern:
+        pattern = SEPARATED.sub(r'\1', pattern)
+        pattern = DOTTED.sub(r'\1', pattern)
 
     if query.syntax != pattern:
-        logger.debug(f'translated: {query.syntax!r} => {pattern!r}')
+        logger.debug('translated: %r => %r', query.syntax, pattern)
 
     return query._replace(syntax=pattern)
 
 
+def wildcard(metavar: re.Match) -> str:
+    return '...' if metavar['kind'] == '...' else '$_'
+
+
 class Runner:
     def __init__(self, metrics: Optional[TextIO] = None) -> None:
-        self.log = metrics
+        self.log, self.lock = metrics, Lock()
+        # reused to format the run info prefixing each metrics row
+        self.buffer = StringIO()
+        self.writer = csv.writer(self.buffer)
 
     def __call__(self, query: Query, file: Path | str) -> Iterable[Match]:
-        if self.log is not None:
-            # prefix metrics with run info
-            csv.writer(buffer := StringIO()).writerow((*query, file, ''))
-            self.log.write(buffer.getvalue().rstrip())
+        if self.log is None:
+            yield from run(query, file)
+            return
+
+        yield from run(query, file, metrics := StringIO())
+
+        with self.lock:  # runs may finish concurrently
+            self.writer.writerow((*query, file, ''))
+            self.log.write(self.buffer.getvalue().rstrip() + metrics.getvalue())
             self.log.flush()
 
-        yield from run(query, file, self.log)
+            self.buffer.seek(0)
+            self.buffer.truncate()
 
     def metrics(self) -> Iterable['Metrics']:
         assert self.log is not None, 'metrics not recorded'
@@ -58,7 +78,7 @@ class Runner:
         for l, q, p, *vs in csv.reader(self.log):
             n, d, k, w, pt, st = map(int, vs)
             yield Metrics(
-                Query(Language(l), q), Metrics.Seq(k, w),
+                Query.of(l, q), Metrics.Seq(k, w),
                 p, Metrics.Tree(n, d),
                 Metrics.Time(pt, st),
             )
@@ -88,9 +108,15 @@ def run(query: Query, file: Path | str, metrics: Optional[TextIO] = None) -> Ite
     if metrics:
         cmd.append('--metrics')
 
-    logger.debug(f'$ {subprocess.list2cmdline(cmd)}')
-    with subprocess.Popen(cmd, text=True, stdout=subprocess.PIPE, stderr=metrics) as process:
-        yield from map(Match.parse, process.stdout or ())
+    logger.debug('$ %s', subprocess.list2cmdline(cmd))
+    stderr = subprocess.PIPE if metrics else None
+    with subprocess.Popen(cmd, text=True, stdout=subprocess.PIPE, stderr=stderr) as process:
+        output, errors = process.communicate()
+
+    if metrics:
+        metrics.write(errors)
+
+    yield from map(Match.parse, StringIO(output))
 
-        if code := process.wait():
-            logger.error(f'stsearch: exit {code}')
+    if code := process.returncode:
+        logger.error('stsearch: exit %d', code)